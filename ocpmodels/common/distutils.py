@@ -140,6 +140,24 @@ def all_reduce(data, group=dist.group.WORLD, average=False, device=None):
     return result
 
 
+def all_gather_object(data, group=dist.group.WORLD):
+    """Gather arbitrary picklable objects from all ranks into a list."""
+    if get_world_size() == 1:
+        return [data]
+    output = [None for _ in range(get_world_size())]
+    dist.all_gather_object(output, data, group=group)
+    return output
+
+
+def all_reduce_async(tensor, group=dist.group.WORLD):
+    """Start an in-place all_reduce and return the work handle, or None
+    when not running distributed. Lets callers overlap the reduction with
+    local compute before calling wait()."""
+    if get_world_size() == 1:
+        return None
+    return dist.all_reduce(tensor, group=group, async_op=True)
+
+
 def all_gather(data, group=dist.group.WORLD, device=None):
     if get_world_size() == 1:
         return data
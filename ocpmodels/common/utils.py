@@ -519,7 +519,9 @@ def get_pbc_distances(
     # correct for pbc
     neighbors = neighbors.to(cell.device)
     cell = torch.repeat_interleave(cell, neighbors, dim=0)
-    offsets = cell_offsets.float().view(-1, 1, 3).bmm(cell.float()).view(-1, 3)
+    # row-vector x matrix product as an elementwise multiply + reduce,
+    # avoiding a batched GEMM dispatch for 1x3 operands
+    offsets = (cell_offsets.float().unsqueeze(-1) * cell.float()).sum(dim=1)
     distance_vectors += offsets
 
     # compute distances
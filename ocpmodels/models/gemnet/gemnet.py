@@ -10,7 +10,7 @@ from typing import Optional
 import numpy as np
 import torch
 from torch_geometric.nn import radius_graph
-from torch_scatter import scatter
+from torch_scatter import scatter, segment_coo
 from torch_sparse import SparseTensor
 
 from ocpmodels.common.registry import registry
@@ -557,8 +557,9 @@ class GemNetT(BaseModel):
                 E_t, batch, dim=0, dim_size=nMolecules, reduce="add"
             )  # (nMolecules, num_targets)
         else:
-            E_t = scatter(
-                E_t, batch, dim=0, dim_size=nMolecules, reduce="mean"
+            # segment_coo assumes sorted batch
+            E_t = segment_coo(
+                E_t, batch, dim_size=nMolecules, reduce="mean"
             )  # (nMolecules, num_targets)
 
         if self.regress_forces:
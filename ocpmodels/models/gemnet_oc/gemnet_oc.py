@@ -1311,8 +1311,9 @@ class GemNetOC(BaseModel):
                 E_t, batch, dim=0, dim_size=nMolecules, reduce="add"
             )  # (nMolecules, num_targets)
         else:
-            E_t = scatter(
-                E_t, batch, dim=0, dim_size=nMolecules, reduce="mean"
+            # segment_coo assumes sorted batch
+            E_t = segment_coo(
+                E_t, batch, dim_size=nMolecules, reduce="mean"
             )  # (nMolecules, num_targets)
 
         if self.regress_forces:
@@ -112,6 +112,27 @@ class ExponentialMovingAverage:
         for s_param, param in zip(self.shadow_params, parameters):
             param.data.copy_(s_param.data)
 
+    def swap(
+        self, parameters: Optional[Iterable[torch.nn.Parameter]] = None
+    ) -> None:
+        """
+        Swap the parameters with the stored moving averages in place.
+
+        Unlike the `store` / `copy_to` / `restore` sequence, this neither
+        allocates nor copies any tensors: the parameter and shadow storages
+        are exchanged by pointer. Call it once to evaluate with the averaged
+        weights and a second time to return to the training weights.
+
+        Args:
+          parameters: Iterable of `torch.nn.Parameter`; the parameters to be
+            swapped with the moving averages. If `None`, the parameters with
+            which this `ExponentialMovingAverage` was initialized will be
+            used.
+        """
+        parameters = self._get_parameters(parameters)
+        for s_param, param in zip(self.shadow_params, parameters):
+            param.data, s_param.data = s_param.data, param.data
+
     def store(
         self, parameters: Optional[Iterable[torch.nn.Parameter]] = None
     ) -> None:
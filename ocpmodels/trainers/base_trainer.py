@@ -11,7 +11,7 @@ import os
 import random
 import subprocess
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import torch
@@ -268,12 +268,24 @@ class BaseTrainer(ABC):
         return sampler
 
     def get_dataloader(self, dataset, sampler):
+        num_workers = self.config["optim"]["num_workers"]
+        loader_kwargs = {}
+        if num_workers > 0:
+            # Keep worker processes alive across epochs and prefetch ahead
+            # so pinned-memory batches are ready before the step needs them.
+            loader_kwargs["persistent_workers"] = self.config["optim"].get(
+                "persistent_workers", True
+            )
+            loader_kwargs["prefetch_factor"] = self.config["optim"].get(
+                "prefetch_factor", 2
+            )
         loader = DataLoader(
             dataset,
             collate_fn=self.parallel_collater,
-            num_workers=self.config["optim"]["num_workers"],
+            num_workers=num_workers,
             pin_memory=True,
             batch_sampler=sampler,
+            **loader_kwargs,
         )
         return loader
 
@@ -417,21 +429,19 @@ class BaseTrainer(ABC):
         mod_key_count = next(iter(self.model.state_dict())).count("module")
         key_count_diff = mod_key_count - ckpt_key_count
 
+        # Rename keys in place instead of rebuilding the whole state_dict.
+        state_dict = checkpoint["state_dict"]
         if key_count_diff > 0:
-            new_dict = {
-                key_count_diff * "module." + k: v
-                for k, v in checkpoint["state_dict"].items()
-            }
+            prefix = key_count_diff * "module."
+            for k in list(state_dict.keys()):
+                state_dict[prefix + k] = state_dict.pop(k)
         elif key_count_diff < 0:
-            new_dict = {
-                k[len("module.") * abs(key_count_diff) :]: v
-                for k, v in checkpoint["state_dict"].items()
-            }
-        else:
-            new_dict = checkpoint["state_dict"]
+            strip_len = len("module.") * abs(key_count_diff)
+            for k in list(state_dict.keys()):
+                state_dict[k[strip_len:]] = state_dict.pop(k)
 
         strict = self.config["task"].get("strict_load", True)
-        load_state_dict(self.model, new_dict, strict=strict)
+        load_state_dict(self.model, state_dict, strict=strict)
 
         if "optimizer" in checkpoint:
             self.optimizer.load_state_dict(checkpoint["optimizer"])
@@ -566,8 +576,7 @@ class BaseTrainer(ABC):
                 )
             else:
                 if self.ema:
-                    self.ema.store()
-                    self.ema.copy_to()
+                    self.ema.swap()
                 ckpt_path = save_checkpoint(
                     {
                         "state_dict": self.model.state_dict(),
@@ -585,7 +594,7 @@ class BaseTrainer(ABC):
                     checkpoint_file=checkpoint_file,
                 )
                 if self.ema:
-                    self.ema.restore()
+                    self.ema.swap()
                 return ckpt_path
         return None
 
@@ -641,8 +650,7 @@ class BaseTrainer(ABC):
 
         self.model.eval()
         if self.ema:
-            self.ema.store()
-            self.ema.copy_to()
+            self.ema.swap()
 
         evaluator, metrics = Evaluator(task=self.name), {}
         rank = distutils.get_rank()
@@ -659,26 +667,35 @@ class BaseTrainer(ABC):
             # Forward.
             with torch.cuda.amp.autocast(enabled=self.scaler is not None):
                 out = self._forward(batch)
-            loss = self._compute_loss(out, batch)
+                loss = self._compute_loss(out, batch)
 
             # Compute metrics.
             metrics = self._compute_metrics(out, batch, evaluator, metrics)
             metrics = evaluator.update("loss", loss.item(), metrics)
 
-        aggregated_metrics = {}
-        for k in metrics:
-            aggregated_metrics[k] = {
-                "total": distutils.all_reduce(
-                    metrics[k]["total"], average=False, device=self.device
-                ),
-                "numel": distutils.all_reduce(
-                    metrics[k]["numel"], average=False, device=self.device
-                ),
-            }
-            aggregated_metrics[k]["metric"] = (
-                aggregated_metrics[k]["total"] / aggregated_metrics[k]["numel"]
-            )
-        metrics = aggregated_metrics
+        # Fuse all (total, numel) pairs into one tensor so validation needs
+        # a single all_reduce instead of two per metric.
+        metric_keys = list(metrics)
+        # reshape keeps two columns even when there are no metrics, where
+        # torch.tensor([]) would produce a 1-D tensor.
+        stats = torch.tensor(
+            [
+                [metrics[k]["total"], metrics[k]["numel"]]
+                for k in metric_keys
+            ],
+            device=self.device,
+        ).reshape(-1, 2)
+        stats = distutils.all_reduce(stats, average=False)
+        # One vectorized divide plus a single tolist() moves all reduced
+        # stats and metric values to the host in one device sync, instead
+        # of one item() call per scalar.
+        stats = torch.cat(
+            [stats, (stats[:, 0] / stats[:, 1]).unsqueeze(1)], dim=1
+        ).tolist()
+        metrics = {
+            k: {"total": total, "numel": numel, "metric": metric}
+            for k, (total, numel, metric) in zip(metric_keys, stats)
+        }
 
         log_dict = {k: metrics[k]["metric"] for k in metrics}
         log_dict.update({"epoch": self.epoch})
@@ -695,7 +712,7 @@ class BaseTrainer(ABC):
             )
 
         if self.ema:
-            self.ema.restore()
+            self.ema.swap()
 
         return metrics
 
@@ -708,7 +725,8 @@ class BaseTrainer(ABC):
         """Derived classes should implement this function."""
 
     def _backward(self, loss):
-        self.optimizer.zero_grad()
+        # set_to_none frees the gradient buffers instead of zeroing them
+        self.optimizer.zero_grad(set_to_none=True)
         loss.backward()
         # Scale down the gradients of shared parameters
         if hasattr(self.model.module, "shared_parameters"):
@@ -746,50 +764,111 @@ class BaseTrainer(ABC):
         if results_file is None:
             return
 
+        save_dict = {
+            "ids": predictions["id"],
+            **{key: predictions[key] for key in keys},
+        }
+        # Store forces as one flat (n_atoms, 3) array; the ragged per-image
+        # layout would have to go through pickled object arrays.
+        if "forces" in keys:
+            save_dict["forces"] = np.concatenate(predictions["forces"])
+
+        if distutils.get_world_size() == 1:
+            # Single-process runs have nothing to gather and no duplicate
+            # ids to drop; write the final file directly instead of
+            # round-tripping through a per-rank npz.
+            full_path = os.path.join(
+                self.config["cmd"]["results_dir"],
+                f"{self.name}_{results_file}.npz",
+            )
+            if "chunk_idx" in keys:
+                save_dict["chunk_idx"] = np.cumsum(
+                    save_dict["chunk_idx"]
+                )[:-1]
+            logging.info(f"Writing results to {full_path}")
+            np.savez_compressed(full_path, **save_dict)
+            return
+
         results_file_path = os.path.join(
             self.config["cmd"]["results_dir"],
             f"{self.name}_{results_file}_{distutils.get_rank()}.npz",
         )
-        np.savez_compressed(
-            results_file_path,
-            ids=predictions["id"],
-            **{key: predictions[key] for key in keys},
-        )
+        np.savez_compressed(results_file_path, **save_dict)
 
         distutils.synchronize()
         if distutils.is_master():
-            gather_results = defaultdict(list)
             full_path = os.path.join(
                 self.config["cmd"]["results_dir"],
                 f"{self.name}_{results_file}.npz",
             )
 
-            for i in range(distutils.get_world_size()):
-                rank_path = os.path.join(
+            rank_paths = [
+                os.path.join(
                     self.config["cmd"]["results_dir"],
                     f"{self.name}_{results_file}_{i}.npz",
                 )
-                rank_results = np.load(rank_path, allow_pickle=True)
-                gather_results["ids"].extend(rank_results["ids"])
-                for key in keys:
-                    gather_results[key].extend(rank_results[key])
+                for i in range(distutils.get_world_size())
+            ]
+            # Read the rank files concurrently; numpy releases the GIL
+            # during the actual reads and the parallel opens hide per-file
+            # metadata latency on networked filesystems.
+            def load_rank_file(rank_path):
+                with np.load(rank_path) as data:
+                    return {field: data[field] for field in data.files}
+
+            with ThreadPoolExecutor(
+                max_workers=min(8, len(rank_paths))
+            ) as pool:
+                rank_data = list(pool.map(load_rank_file, rank_paths))
+
+            # Merge each field with one np.concatenate, which sizes and
+            # fills the output buffer in C, instead of growing Python lists
+            # via extend() and boxing every array element on the way.
+            gather_results = {
+                field: np.concatenate([data[field] for data in rank_data])
+                for field in ["ids"] + list(keys)
+            }
+
+            # Unlink the per-rank files in one batch after the load loop;
+            # interleaving deletes with reads stalls on network filesystems.
+            for rank_path in rank_paths:
                 os.remove(rank_path)
 
             # Because of how distributed sampler works, some system ids
             # might be repeated to make no. of samples even across GPUs.
-            _, idx = np.unique(gather_results["ids"], return_index=True)
-            gather_results["ids"] = np.array(gather_results["ids"])[idx]
+            # Keep the first occurrence of each id: a stable argsort plus a
+            # transition mask does this in one sort, without the extra
+            # passes np.unique(..., return_index=True) makes.
+            ids = gather_results["ids"]
+            order = np.argsort(ids, kind="stable")
+            ids_sorted = ids[order]
+            keep = np.ones(len(ids_sorted), dtype=bool)
+            keep[1:] = ids_sorted[1:] != ids_sorted[:-1]
+            idx = order[keep]
+            gather_results["ids"] = ids_sorted[keep]
+            if "chunk_idx" in keys:
+                counts = gather_results["chunk_idx"]
+                counts_sel = counts[idx]
             for k in keys:
                 if k == "forces":
-                    gather_results[k] = np.concatenate(
-                        np.array(gather_results[k])[idx]
+                    # Blit each selected system's chunk of the flat force
+                    # array into a preallocated output buffer.
+                    flat = gather_results[k]
+                    starts = np.cumsum(counts) - counts
+                    merged = np.empty(
+                        (counts_sel.sum(), 3), dtype=flat.dtype
                     )
+                    offset = 0
+                    for start, natoms in zip(starts[idx], counts_sel):
+                        merged[offset : offset + natoms] = flat[
+                            start : start + natoms
+                        ]
+                        offset += natoms
+                    gather_results[k] = merged
                 elif k == "chunk_idx":
-                    gather_results[k] = np.cumsum(
-                        np.array(gather_results[k])[idx]
-                    )[:-1]
+                    gather_results[k] = np.cumsum(counts_sel)[:-1]
                 else:
-                    gather_results[k] = np.array(gather_results[k])[idx]
+                    gather_results[k] = gather_results[k][idx]
 
             logging.info(f"Writing results to {full_path}")
             np.savez_compressed(full_path, **gather_results)
@@ -123,8 +123,7 @@ class EnergyTrainer(BaseTrainer):
 
         self.model.eval()
         if self.ema:
-            self.ema.store()
-            self.ema.copy_to()
+            self.ema.swap()
 
         if self.normalizers is not None and "target" in self.normalizers:
             self.normalizers["target"].to(self.device)
@@ -157,15 +156,19 @@ class EnergyTrainer(BaseTrainer):
         self.save_results(predictions, results_file, keys=["energy"])
 
         if self.ema:
-            self.ema.restore()
+            self.ema.swap()
 
         return predictions
 
     def train(self, disable_eval_tqdm=False):
         ensure_fitted(self._unwrapped_model, warn=True)
 
+        # Bind loop-invariant values once; len(DataLoader) and the config
+        # lookups would otherwise be re-evaluated every step.
+        num_train_batches = len(self.train_loader)
+        print_every = self.config["cmd"]["print_every"]
         eval_every = self.config["optim"].get(
-            "eval_every", len(self.train_loader)
+            "eval_every", num_train_batches
         )
         primary_metric = self.config["task"].get(
             "primary_metric", self.evaluator.task_primary_metric[self.name]
@@ -174,18 +177,18 @@ class EnergyTrainer(BaseTrainer):
 
         # Calculate start_epoch from step instead of loading the epoch number
         # to prevent inconsistencies due to different batch size in checkpoint.
-        start_epoch = self.step // len(self.train_loader)
+        start_epoch = self.step // num_train_batches
 
         for epoch_int in range(
             start_epoch, self.config["optim"]["max_epochs"]
         ):
             self.train_sampler.set_epoch(epoch_int)
-            skip_steps = self.step % len(self.train_loader)
+            skip_steps = self.step % num_train_batches
             train_loader_iter = iter(self.train_loader)
 
-            for i in range(skip_steps, len(self.train_loader)):
-                self.epoch = epoch_int + (i + 1) / len(self.train_loader)
-                self.step = epoch_int * len(self.train_loader) + i + 1
+            for i in range(skip_steps, num_train_batches):
+                self.epoch = epoch_int + (i + 1) / num_train_batches
+                self.step = epoch_int * num_train_batches + i + 1
                 self.model.train()
 
                 # Get a batch.
@@ -220,7 +223,7 @@ class EnergyTrainer(BaseTrainer):
                     }
                 )
                 if (
-                    self.step % self.config["cmd"]["print_every"] == 0
+                    self.step % print_every == 0
                     and distutils.is_master()
                     and not self.is_hpo
                 ):
@@ -285,7 +288,11 @@ class EnergyTrainer(BaseTrainer):
                 else:
                     self.scheduler.step()
 
-            torch.cuda.empty_cache()
+            # Flushing the caching allocator forces a device sync and stalls
+            # the next epoch; only do it when explicitly requested to work
+            # around memory fragmentation.
+            if self.config["optim"].get("empty_cache_every_epoch", False):
+                torch.cuda.empty_cache()
 
         self.train_dataset.close_db()
         if self.config.get("val_dataset", False):
@@ -9,6 +9,7 @@ import logging
 import os
 import pathlib
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
@@ -174,8 +175,7 @@ class ForcesTrainer(BaseTrainer):
 
         self.model.eval()
         if self.ema:
-            self.ema.store()
-            self.ema.copy_to()
+            self.ema.swap()
 
         if self.normalizers is not None and "target" in self.normalizers:
             self.normalizers["target"].to(self.device)
@@ -201,21 +201,27 @@ class ForcesTrainer(BaseTrainer):
                     out["forces"]
                 )
             if per_image:
+                # Issue the small D2H copies before the force download so
+                # they overlap with it; the tolist() calls below then only
+                # sync once, on already-transferred CPU tensors.
+                sids = batch_list[0].sid.to("cpu", non_blocking=True)
+                fids = batch_list[0].fid.to("cpu", non_blocking=True)
+                batch_natoms = torch.cat(
+                    [batch.natoms for batch in batch_list]
+                ).to("cpu", non_blocking=True)
+                batch_fixed = torch.cat(
+                    [batch.fixed for batch in batch_list]
+                ).to("cpu", non_blocking=True)
+                # cast to fp16 on device so the D2H copy moves half the bytes
+                forces = out["forces"].detach().to(torch.float16).cpu()
                 systemids = [
                     str(i) + "_" + str(j)
-                    for i, j in zip(
-                        batch_list[0].sid.tolist(), batch_list[0].fid.tolist()
-                    )
+                    for i, j in zip(sids.tolist(), fids.tolist())
                 ]
                 predictions["id"].extend(systemids)
                 predictions["energy"].extend(
                     out["energy"].to(torch.float16).tolist()
                 )
-                batch_natoms = torch.cat(
-                    [batch.natoms for batch in batch_list]
-                )
-                batch_fixed = torch.cat([batch.fixed for batch in batch_list])
-                forces = out["forces"].cpu().detach().to(torch.float16)
                 per_image_forces = torch.split(forces, batch_natoms.tolist())
                 per_image_forces = [
                     force.numpy() for force in per_image_forces
@@ -244,19 +250,28 @@ class ForcesTrainer(BaseTrainer):
                 predictions["energy"] = out["energy"].detach()
                 predictions["forces"] = out["forces"].detach()
                 if self.ema:
-                    self.ema.restore()
+                    self.ema.swap()
                 return predictions
 
-        predictions["forces"] = np.array(predictions["forces"])
-        predictions["chunk_idx"] = np.array(predictions["chunk_idx"])
-        predictions["energy"] = np.array(predictions["energy"])
-        predictions["id"] = np.array(predictions["id"])
+        # Preallocate an object array and fill it instead of letting
+        # np.array infer a dtype for the ragged per-image force arrays.
+        forces_arr = np.empty(len(predictions["forces"]), dtype=object)
+        for idx, force in enumerate(predictions["forces"]):
+            forces_arr[idx] = force
+        predictions["forces"] = forces_arr
+        predictions["chunk_idx"] = np.asarray(
+            predictions["chunk_idx"], dtype=np.int64
+        )
+        predictions["energy"] = np.asarray(
+            predictions["energy"], dtype=np.float16
+        )
+        predictions["id"] = np.asarray(predictions["id"])
         self.save_results(
             predictions, results_file, keys=["energy", "forces", "chunk_idx"]
         )
 
         if self.ema:
-            self.ema.restore()
+            self.ema.swap()
 
         return predictions
 
@@ -289,8 +304,12 @@ class ForcesTrainer(BaseTrainer):
     def train(self, disable_eval_tqdm=False):
         ensure_fitted(self._unwrapped_model, warn=True)
 
+        # Bind loop-invariant values once; len(DataLoader) and the config
+        # lookups would otherwise be re-evaluated every step.
+        num_train_batches = len(self.train_loader)
+        print_every = self.config["cmd"]["print_every"]
         eval_every = self.config["optim"].get(
-            "eval_every", len(self.train_loader)
+            "eval_every", num_train_batches
         )
         checkpoint_every = self.config["optim"].get(
             "checkpoint_every", eval_every
@@ -309,19 +328,36 @@ class ForcesTrainer(BaseTrainer):
 
         # Calculate start_epoch from step instead of loading the epoch number
         # to prevent inconsistencies due to different batch size in checkpoint.
-        start_epoch = self.step // len(self.train_loader)
+        start_epoch = self.step // num_train_batches
+        pending_losses = []
+
+        # Countdowns to the next log/checkpoint/eval step; decrement-and-test
+        # is cheaper than three modulo checks per step and `self.step`
+        # advances by one per iteration, also across epoch boundaries.
+        is_master = distutils.is_master()
+        until_log = print_every - self.step % print_every
+        until_eval = eval_every - self.step % eval_every
+        until_ckpt = (
+            checkpoint_every - self.step % checkpoint_every
+            if checkpoint_every != -1
+            else -1
+        )
 
         for epoch_int in range(
             start_epoch, self.config["optim"]["max_epochs"]
         ):
             self.train_sampler.set_epoch(epoch_int)
-            skip_steps = self.step % len(self.train_loader)
+            skip_steps = self.step % num_train_batches
             train_loader_iter = iter(self.train_loader)
 
-            for i in range(skip_steps, len(self.train_loader)):
-                self.epoch = epoch_int + (i + 1) / len(self.train_loader)
-                self.step = epoch_int * len(self.train_loader) + i + 1
+            for i in range(skip_steps, num_train_batches):
+                self.epoch = epoch_int + (i + 1) / num_train_batches
+                self.step = epoch_int * num_train_batches + i + 1
                 self.model.train()
+                until_log -= 1
+                until_eval -= 1
+                if until_ckpt > 0:
+                    until_ckpt -= 1
 
                 # Get a batch.
                 batch = next(train_loader_iter)
@@ -341,9 +377,18 @@ class ForcesTrainer(BaseTrainer):
                     self.evaluator,
                     self.metrics,
                 )
-                self.metrics = self.evaluator.update(
-                    "loss", loss.item() / scale, self.metrics
-                )
+                # Buffer the loss on device; folding it into the metrics
+                # with a single sync per log window replaces one .item()
+                # sync every step.
+                pending_losses.append(loss.detach() / scale)
+                if until_log == 0 or until_eval == 0:
+                    for loss_val in (
+                        torch.stack(pending_losses).cpu().tolist()
+                    ):
+                        self.metrics = self.evaluator.update(
+                            "loss", loss_val, self.metrics
+                        )
+                    pending_losses = []
 
                 # Log metrics.
                 log_dict = {k: self.metrics[k]["metric"] for k in self.metrics}
@@ -354,11 +399,7 @@ class ForcesTrainer(BaseTrainer):
                         "step": self.step,
                     }
                 )
-                if (
-                    self.step % self.config["cmd"]["print_every"] == 0
-                    and distutils.is_master()
-                    and not self.is_hpo
-                ):
+                if until_log == 0 and is_master and not self.is_hpo:
                     log_str = [
                         "{}: {:.2e}".format(k, v) for k, v in log_dict.items()
                     ]
@@ -372,16 +413,14 @@ class ForcesTrainer(BaseTrainer):
                         split="train",
                     )
 
-                if (
-                    checkpoint_every != -1
-                    and self.step % checkpoint_every == 0
-                ):
+                if until_ckpt == 0:
                     self.save(
                         checkpoint_file="checkpoint.pt", training_state=True
                     )
+                    until_ckpt = checkpoint_every
 
                 # Evaluate on val set every `eval_every` iterations.
-                if self.step % eval_every == 0:
+                if until_eval == 0:
                     if self.val_loader is not None:
                         val_metrics = self.validate(
                             split="val",
@@ -409,14 +448,23 @@ class ForcesTrainer(BaseTrainer):
                             self.run_relaxations()
 
                 if self.scheduler.scheduler_type == "ReduceLROnPlateau":
-                    if self.step % eval_every == 0:
+                    if until_eval == 0:
                         self.scheduler.step(
                             metrics=val_metrics[primary_metric]["metric"],
                         )
                 else:
                     self.scheduler.step()
 
-            torch.cuda.empty_cache()
+                if until_log == 0:
+                    until_log = print_every
+                if until_eval == 0:
+                    until_eval = eval_every
+
+            # Flushing the caching allocator forces a device sync and stalls
+            # the next epoch; only do it when explicitly requested to work
+            # around memory fragmentation.
+            if self.config["optim"].get("empty_cache_every_epoch", False):
+                torch.cuda.empty_cache()
 
             if checkpoint_every == -1:
                 self.save(checkpoint_file="checkpoint.pt", training_state=True)
@@ -446,13 +494,41 @@ class ForcesTrainer(BaseTrainer):
 
         return out
 
+    def _cat_batch_field(self, batch_list, key):
+        # Concatenate a per-graph attribute across the batch list onto
+        # self.device. Results are cached per batch so the loss and metric
+        # computations within one step share a single H2D copy per field.
+        if getattr(self, "_batch_field_src", None) is not batch_list[0]:
+            self._batch_field_src = batch_list[0]
+            self._batch_field_cache = {}
+        cache = self._batch_field_cache
+        if key not in cache:
+            cache[key] = torch.cat(
+                [
+                    getattr(batch, key).to(self.device, non_blocking=True)
+                    for batch in batch_list
+                ],
+                dim=0,
+            )
+        return cache[key]
+
+    def _natoms_per_atom(self, batch_list):
+        # Per-atom system sizes for the atomwise losses, cached alongside
+        # the concatenated fields so repeated calls on one batch reuse the
+        # repeat_interleave result.
+        natoms = self._cat_batch_field(batch_list, "natoms")
+        cache = self._batch_field_cache
+        if "natoms_per_atom" not in cache:
+            cache["natoms_per_atom"] = torch.repeat_interleave(
+                natoms, natoms
+            )
+        return cache["natoms_per_atom"]
+
     def _compute_loss(self, out, batch_list):
         loss = []
 
         # Energy loss.
-        energy_target = torch.cat(
-            [batch.y.to(self.device) for batch in batch_list], dim=0
-        )
+        energy_target = self._cat_batch_field(batch_list, "y")
         if self.normalizer.get("normalize_labels", False):
             energy_target = self.normalizers["target"].norm(energy_target)
         energy_mult = self.config["optim"].get("energy_coefficient", 1)
@@ -462,9 +538,7 @@ class ForcesTrainer(BaseTrainer):
 
         # Force loss.
         if self.config["model_attributes"].get("regress_forces", True):
-            force_target = torch.cat(
-                [batch.force.to(self.device) for batch in batch_list], dim=0
-            )
+            force_target = self._cat_batch_field(batch_list, "force")
             if self.normalizer.get("normalize_labels", False):
                 force_target = self.normalizers["grad_target"].norm(
                     force_target
@@ -477,26 +551,32 @@ class ForcesTrainer(BaseTrainer):
                 # handle tag specific weights as introduced in forcenet
                 assert len(tag_specific_weights) == 3
 
-                batch_tags = torch.cat(
-                    [
-                        batch.tags.float().to(self.device)
-                        for batch in batch_list
-                    ],
-                    dim=0,
+                batch_tags = self._cat_batch_field(batch_list, "tags")
+                if not hasattr(self, "_tag_weight_lut"):
+                    self._tag_weight_lut = torch.tensor(
+                        tag_specific_weights,
+                        dtype=torch.float32,
+                        device=self.device,
+                    )
+                # single gather instead of three masked writes
+                weight = self._tag_weight_lut[batch_tags.long()]
+
+                train_loss_force_normalizer = 3.0 * weight.sum()
+
+                # add up normalizer to obtain global normalizer; run the
+                # collective asynchronously so it overlaps with computing
+                # the local unnormalized loss below
+                normalizer_work = distutils.all_reduce_async(
+                    train_loss_force_normalizer
                 )
-                weight = torch.zeros_like(batch_tags)
-                weight[batch_tags == 0] = tag_specific_weights[0]
-                weight[batch_tags == 1] = tag_specific_weights[1]
-                weight[batch_tags == 2] = tag_specific_weights[2]
 
                 loss_force_list = torch.abs(out["forces"] - force_target)
                 train_loss_force_unnormalized = torch.sum(
                     loss_force_list * weight.view(-1, 1)
                 )
-                train_loss_force_normalizer = 3.0 * weight.sum()
 
-                # add up normalizer to obtain global normalizer
-                distutils.all_reduce(train_loss_force_normalizer)
+                if normalizer_work is not None:
+                    normalizer_work.wait()
 
                 # perform loss normalization before backprop
                 train_loss_force_normalized = train_loss_force_unnormalized * (
@@ -508,9 +588,7 @@ class ForcesTrainer(BaseTrainer):
                 # Force coefficient = 30 has been working well for us.
                 force_mult = self.config["optim"].get("force_coefficient", 30)
                 if self.config["task"].get("train_on_free_atoms", False):
-                    fixed = torch.cat(
-                        [batch.fixed.to(self.device) for batch in batch_list]
-                    )
+                    fixed = self._cat_batch_field(batch_list, "fixed")
                     mask = fixed == 0
                     if (
                         self.config["optim"]
@@ -520,13 +598,7 @@ class ForcesTrainer(BaseTrainer):
                         force_mult = self.config["optim"].get(
                             "force_coefficient", 1
                         )
-                        natoms = torch.cat(
-                            [
-                                batch.natoms.to(self.device)
-                                for batch in batch_list
-                            ]
-                        )
-                        natoms = torch.repeat_interleave(natoms, natoms)
+                        natoms = self._natoms_per_atom(batch_list)
                         force_loss = force_mult * self.loss_fn["force"](
                             out["forces"][mask],
                             force_target[mask],
@@ -551,43 +623,36 @@ class ForcesTrainer(BaseTrainer):
         for lc in loss:
             assert hasattr(lc, "grad_fn")
 
-        loss = sum(loss)
+        loss = torch.stack(loss).sum()
         return loss
 
     def _compute_metrics(self, out, batch_list, evaluator, metrics={}):
-        natoms = torch.cat(
-            [batch.natoms.to(self.device) for batch in batch_list], dim=0
-        )
+        natoms = self._cat_batch_field(batch_list, "natoms")
 
         target = {
-            "energy": torch.cat(
-                [batch.y.to(self.device) for batch in batch_list], dim=0
-            ),
-            "forces": torch.cat(
-                [batch.force.to(self.device) for batch in batch_list], dim=0
-            ),
+            "energy": self._cat_batch_field(batch_list, "y"),
+            "forces": self._cat_batch_field(batch_list, "force"),
             "natoms": natoms,
         }
 
         out["natoms"] = natoms
 
         if self.config["task"].get("eval_on_free_atoms", True):
-            fixed = torch.cat(
-                [batch.fixed.to(self.device) for batch in batch_list]
-            )
+            fixed = self._cat_batch_field(batch_list, "fixed")
             mask = fixed == 0
             out["forces"] = out["forces"][mask]
             target["forces"] = target["forces"][mask]
 
-            s_idx = 0
-            natoms_free = []
-            for natoms in target["natoms"]:
-                natoms_free.append(
-                    torch.sum(mask[s_idx : s_idx + natoms]).item()
-                )
-                s_idx += natoms
-            target["natoms"] = torch.LongTensor(natoms_free).to(self.device)
-            out["natoms"] = torch.LongTensor(natoms_free).to(self.device)
+            # Count free atoms per image with one segment reduction instead
+            # of a Python loop syncing once per image.
+            image_idx = torch.repeat_interleave(
+                torch.arange(natoms.shape[0], device=natoms.device), natoms
+            )
+            natoms_free = torch.zeros_like(natoms).index_add_(
+                0, image_idx, mask.long()
+            )
+            target["natoms"] = natoms_free
+            out["natoms"] = natoms_free
 
         if self.normalizer.get("normalize_labels", False):
             out["energy"] = self.normalizers["target"].denorm(out["energy"])
@@ -603,9 +668,10 @@ class ForcesTrainer(BaseTrainer):
 
         logging.info("Running ML-relaxations")
         self.model.eval()
-        if self.ema:
-            self.ema.store()
-            self.ema.copy_to()
+        # No EMA swap here: every relaxation forward goes through predict(),
+        # which swaps the EMA weights in and out itself. An outer swap would
+        # be cancelled by the nested one and the relaxations would run with
+        # the raw training weights.
 
         evaluator_is2rs, metrics_is2rs = Evaluator(task="is2rs"), {}
         evaluator_is2re, metrics_is2re = Evaluator(task="is2re"), {}
@@ -696,81 +762,123 @@ class ForcesTrainer(BaseTrainer):
                     metrics_is2re,
                 )
 
+        write_future = None
         if self.config["task"].get("write_pos", False):
-            rank = distutils.get_rank()
-            pos_filename = os.path.join(
-                self.config["cmd"]["results_dir"], f"relaxed_pos_{rank}.npz"
-            )
-            np.savez_compressed(
-                pos_filename,
-                ids=ids,
-                pos=np.array(relaxed_positions, dtype=object),
-                chunk_idx=chunk_idx,
+            # Gather the per-rank results in memory instead of writing,
+            # re-reading and deleting one compressed npz per rank.
+            all_results = distutils.all_gather_object(
+                {
+                    "ids": ids,
+                    "pos": relaxed_positions,
+                    "chunk_idx": chunk_idx,
+                }
             )
 
-            distutils.synchronize()
             if distutils.is_master():
-                gather_results = defaultdict(list)
                 full_path = os.path.join(
                     self.config["cmd"]["results_dir"],
                     "relaxed_positions.npz",
                 )
 
-                for i in range(distutils.get_world_size()):
-                    rank_path = os.path.join(
-                        self.config["cmd"]["results_dir"],
-                        f"relaxed_pos_{i}.npz",
-                    )
-                    rank_results = np.load(rank_path, allow_pickle=True)
-                    gather_results["ids"].extend(rank_results["ids"])
-                    gather_results["pos"].extend(rank_results["pos"])
-                    gather_results["chunk_idx"].extend(
-                        rank_results["chunk_idx"]
-                    )
-                    os.remove(rank_path)
-
-                # Because of how distributed sampler works, some system ids
-                # might be repeated to make no. of samples even across GPUs.
-                _, idx = np.unique(gather_results["ids"], return_index=True)
-                gather_results["ids"] = np.array(gather_results["ids"])[idx]
-                gather_results["pos"] = np.concatenate(
-                    np.array(gather_results["pos"])[idx]
-                )
-                gather_results["chunk_idx"] = np.cumsum(
-                    np.array(gather_results["chunk_idx"])[idx]
-                )[
-                    :-1
-                ]  # np.split does not need last idx, assumes n-1:end
+                def merge_and_write():
+                    gather_results = defaultdict(list)
+                    for rank_results in all_results:
+                        gather_results["ids"].extend(rank_results["ids"])
+                        gather_results["pos"].extend(rank_results["pos"])
+                        gather_results["chunk_idx"].extend(
+                            rank_results["chunk_idx"]
+                        )
 
-                logging.info(f"Writing results to {full_path}")
-                np.savez_compressed(full_path, **gather_results)
+                    # Because of how distributed sampler works, some system
+                    # ids might be repeated to make no. of samples even
+                    # across GPUs. Keep the first occurrence of each id via
+                    # a stable argsort and a transition mask instead of
+                    # np.unique.
+                    all_ids = np.array(gather_results["ids"])
+                    order = np.argsort(all_ids, kind="stable")
+                    ids_sorted = all_ids[order]
+                    keep = np.ones(len(ids_sorted), dtype=bool)
+                    keep[1:] = ids_sorted[1:] != ids_sorted[:-1]
+                    idx = order[keep]
+                    gather_results["ids"] = ids_sorted[keep]
+                    # Slice-assign each selected system into one
+                    # preallocated (total_atoms, 3) buffer; np.concatenate
+                    # on an object array would materialize every chunk a
+                    # second time.
+                    natoms_sel = np.array(gather_results["chunk_idx"])[idx]
+                    pos_list = gather_results["pos"]
+                    flat_pos = np.empty((natoms_sel.sum(), 3))
+                    offset = 0
+                    for i, natoms in zip(idx, natoms_sel):
+                        flat_pos[offset : offset + natoms] = pos_list[i]
+                        offset += natoms
+                    gather_results["pos"] = flat_pos
+                    gather_results["chunk_idx"] = np.cumsum(natoms_sel)[
+                        :-1
+                    ]  # np.split does not need last idx, assumes n-1:end
+
+                    logging.info(f"Writing results to {full_path}")
+                    np.savez(full_path, **gather_results)
+
+                # Run the merge and the uncompressed savez on a worker
+                # thread so the master joins the metric all_reduce below
+                # right away instead of keeping the other ranks waiting at
+                # the collective while it touches the filesystem.
+                if getattr(self, "_write_pool", None) is None:
+                    self._write_pool = ThreadPoolExecutor(max_workers=1)
+                write_future = self._write_pool.submit(merge_and_write)
 
         if split == "val":
+            # Flatten the (total, numel) pairs of both tasks into one
+            # tensor so a single all_reduce covers is2rs and is2re.
+            task_metrics = {
+                "is2rs": metrics_is2rs,
+                "is2re": metrics_is2re,
+            }
+            task_keys = {}
+            stats = []
+            for task, metrics in task_metrics.items():
+                task_keys[task] = list(metrics)
+                stats.extend(
+                    [metrics[k]["total"], metrics[k]["numel"]]
+                    for k in metrics
+                )
+            # reshape keeps two columns even when no batches produced
+            # metrics (all trajectories skipped), where torch.tensor([])
+            # would produce a 1-D tensor.
+            stats = torch.tensor(stats, device=self.device).reshape(-1, 2)
+            stats = distutils.all_reduce(stats, average=False)
+            # One vectorized divide plus a single tolist() moves all
+            # reduced stats and metric values to the host in one device
+            # sync, instead of one item() call per scalar.
+            stats = torch.cat(
+                [stats, (stats[:, 0] / stats[:, 1]).unsqueeze(1)], dim=1
+            ).tolist()
+
+            row = 0
             for task in ["is2rs", "is2re"]:
-                metrics = eval(f"metrics_{task}")
-                aggregated_metrics = {}
-                for k in metrics:
-                    aggregated_metrics[k] = {
-                        "total": distutils.all_reduce(
-                            metrics[k]["total"],
-                            average=False,
-                            device=self.device,
-                        ),
-                        "numel": distutils.all_reduce(
-                            metrics[k]["numel"],
-                            average=False,
-                            device=self.device,
-                        ),
+                metrics = {}
+                for k in task_keys[task]:
+                    total, numel, metric = stats[row]
+                    metrics[k] = {
+                        "total": total,
+                        "numel": numel,
+                        "metric": metric,
+                    }
+                    row += 1
+
+                # Make plots. The prefixed log keys are cached per task so
+                # the f-string formatting runs once instead of once per
+                # metric on every call.
+                if getattr(self, "_log_keys", None) is None:
+                    self._log_keys = {}
+                if task not in self._log_keys:
+                    self._log_keys[task] = {
+                        k: f"{task}_{k}" for k in task_keys[task]
                     }
-                    aggregated_metrics[k]["metric"] = (
-                        aggregated_metrics[k]["total"]
-                        / aggregated_metrics[k]["numel"]
-                    )
-                metrics = aggregated_metrics
-
-                # Make plots.
                 log_dict = {
-                    f"{task}_{k}": metrics[k]["metric"] for k in metrics
+                    self._log_keys[task][k]: metrics[k]["metric"]
+                    for k in metrics
                 }
                 if self.logger is not None:
                     self.logger.log(
@@ -782,5 +890,5 @@ class ForcesTrainer(BaseTrainer):
                 if distutils.is_master():
                     logging.info(metrics)
 
-        if self.ema:
-            self.ema.restore()
+        if write_future is not None:
+            write_future.result()